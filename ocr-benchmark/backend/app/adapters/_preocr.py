@@ -0,0 +1,44 @@
+import os
+from typing import Optional
+
+# PreOCR-style gate: digital PDFs (SaaS invoices, PDF exports) already carry
+# a text layer, so shipping them to an OCR model buys nothing but seconds of
+# latency and API spend. When the layer looks real, adapters return it
+# directly and skip the model call entirely.
+#
+# Opt-in (OCR_PREOCR=1): the text layer skips the model's markdown/table
+# reconstruction, so benchmark comparisons should enable it deliberately.
+
+
+def extract_pdf_text_layer(pdf_bytes: bytes, min_chars: int = 100) -> Optional[str]:
+    """
+    Return the PDF's embedded text layer when it looks substantive,
+    else None (scanned/image-only PDFs fall through to the model).
+    """
+    if os.getenv("OCR_PREOCR", "0").strip() != "1":
+        return None
+
+    try:
+        import fitz  # PyMuPDF, already a backend dependency
+    except Exception:
+        return None
+
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            text = "\n\n".join(page.get_text("text") for page in doc)
+        finally:
+            doc.close()
+    except Exception:
+        return None
+
+    t = text.strip()
+    if len(t) < min_chars:
+        return None
+
+    # Sanity: real prose has bounded word density; broken layers often emit
+    # one "word" per glyph, which OCR would reconstruct better.
+    if len(t.split()) / len(t) >= 0.3:
+        return None
+
+    return t
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+
+# Shared PDF rasterizer for the local CV adapters.
+# /run-benchmark hands the same PDF bytes to every PDF_NATIVE_LOCAL model,
+# and each used to render all pages itself — N identical MuPDF passes per
+# request. Rendering happens here exactly once per (content, zoom) and the
+# RGB page arrays are shared from a small LRU.
+#
+# Cached arrays are handed out to several adapters at once: treat them as
+# READ-ONLY and copy/convert (e.g. cvtColor) before mutating.
+
+_CACHE: "OrderedDict[Tuple[bytes, int], List[np.ndarray]]" = OrderedDict()
+_LOCK = threading.Lock()
+_CACHE_MAX = 8
+# Pages are uncompressed RGB (~10 MB per A4 page at zoom 200/72), so a long
+# document could pin GBs through one entry. Documents whose rendered pages
+# exceed this are returned uncached — same guard as the PNG cache's
+# _RASTER_CACHE_MAX_INPUT in main.py, applied to output size here because
+# a small PDF can still rasterize huge.
+_CACHE_MAX_ENTRY_BYTES = int(
+    os.getenv("OCR_RASTER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)) or 0
+)
+
+
+def pdf_pages_to_rgb(pdf_bytes: bytes, zoom: float = 200 / 72.0) -> List["np.ndarray"]:
+    """
+    Render ALL pages of a PDF to RGB ndarrays, in parallel, memoized by
+    content digest. PyMuPDF releases the GIL inside get_pixmap, so a thread
+    pool gives real page-level parallelism, and np.frombuffer(pix.samples)
+    skips the PNG encode/decode round-trip entirely.
+    """
+    key = (hashlib.blake2b(pdf_bytes, digest_size=16).digest(), int(zoom * 1000))
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            return hit
+
+    import fitz  # PyMuPDF
+    from concurrent.futures import ThreadPoolExecutor
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        mat = fitz.Matrix(zoom, zoom)
+
+        def _render_page(i: int) -> "np.ndarray":
+            pix = doc.load_page(i).get_pixmap(matrix=mat, alpha=False)
+            arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+            return arr.copy()  # detach from the pixmap before it's freed
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+            pages = list(ex.map(_render_page, range(doc.page_count)))
+    finally:
+        doc.close()
+
+    # Optional long-side cap (OCR_RASTER_MAX_SIDE, px; 0 = off): the local
+    # models downscale big pages internally anyway, so shrinking once here
+    # replaces one resize per adapter and shrinks the cached footprint.
+    max_side = int(os.getenv("OCR_RASTER_MAX_SIDE", "0") or 0)
+    if max_side > 0:
+        import cv2
+
+        scaled = []
+        for arr in pages:
+            long_edge = max(arr.shape[0], arr.shape[1])
+            if long_edge > max_side:
+                s = max_side / long_edge
+                arr = cv2.resize(arr, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+            scaled.append(arr)
+        pages = scaled
+
+    # oversized documents skip the cache entirely (see _CACHE_MAX_ENTRY_BYTES)
+    if sum(p.nbytes for p in pages) > _CACHE_MAX_ENTRY_BYTES:
+        return pages
+
+    with _LOCK:
+        _CACHE[key] = pages
+        if len(_CACHE) > _CACHE_MAX:
+            _CACHE.popitem(last=False)
+    return pages
@@ -0,0 +1,149 @@
+import hashlib
+import os
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+# Content-addressed result cache for adapter run() calls.
+# Repeat benchmark iterations hit the same files over and over; keying on
+# the file digest + model skips the whole OCR/API round-trip on a repeat.
+#
+# Enable with OCR_RESULT_CACHE=1. In-memory by default; set OCR_CACHE_DIR
+# to persist across restarts via diskcache (optional dependency).
+
+try:
+    import blake3  # ~1 GB/s, so the hash check is free next to OCR latency
+
+    def _digest(data: bytes) -> str:
+        return blake3.blake3(data).hexdigest()
+
+except Exception:
+
+    def _digest(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+_MEMORY: Dict[str, Any] = {}
+_disk: Any = None
+
+
+def _enabled() -> bool:
+    return os.getenv("OCR_RESULT_CACHE", "0").strip() == "1"
+
+
+def _get_disk():
+    global _disk
+    if _disk is None:
+        cache_dir = os.getenv("OCR_CACHE_DIR", "").strip()
+        if not cache_dir:
+            _disk = False
+        else:
+            try:
+                import diskcache
+
+                _disk = diskcache.Cache(cache_dir)
+            except Exception:
+                _disk = False
+    return _disk or None
+
+
+def _cache_get(key: str) -> Optional[Any]:
+    if key in _MEMORY:
+        return _MEMORY[key]
+    disk = _get_disk()
+    if disk is not None:
+        try:
+            hit = disk.get(key)
+            if hit is not None:
+                _MEMORY[key] = hit
+            return hit
+        except Exception:
+            pass
+    return None
+
+
+def _cache_put(key: str, value: Any) -> None:
+    _MEMORY[key] = value
+    disk = _get_disk()
+    if disk is not None:
+        try:
+            disk.set(key, value)
+        except Exception:
+            pass
+
+
+def _make_key(namespace: str, self: Any, args: tuple, kwargs: Dict[str, Any]) -> Optional[str]:
+    """Build the cache key, or None when no image bytes can be found."""
+    image_bytes = kwargs.get("image_bytes")
+    if image_bytes is None and args:
+        image_bytes = args[0]
+    if not isinstance(image_bytes, (bytes, bytearray)):
+        return None
+    model_id = getattr(self, "model_id", "") or getattr(self, "model", "") or ""
+    return f"{namespace}:{model_id}:{_digest(bytes(image_bytes))}"
+
+
+def cached(namespace: str) -> Callable:
+    """
+    Decorator for adapter run() methods. Key = namespace + model id (when
+    the instance has one) + content digest of the image bytes. Falls
+    straight through when disabled or when no bytes can be found.
+    """
+
+    def deco(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if not _enabled():
+                return fn(self, *args, **kwargs)
+
+            key = _make_key(namespace, self, args, kwargs)
+            if key is None:
+                return fn(self, *args, **kwargs)
+
+            hit = _cache_get(key)
+            if hit is not None:
+                result = dict(hit)
+                result["cache_hit"] = True
+                return result
+
+            result = fn(self, *args, **kwargs)
+            if isinstance(result, dict) and "error" not in result:
+                _cache_put(key, result)
+            return result
+
+        return wrapper
+
+    return deco
+
+
+def cached_async(namespace: str) -> Callable:
+    """
+    Async twin of cached() for adapters that override run_async. The server
+    always dispatches run_async, so without this the sync-side cache never
+    fires on the serving path. Keys are shared with cached(), so a sync hit
+    serves an async miss and vice versa.
+    """
+
+    def deco(fn: Callable) -> Callable:
+        @wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            if not _enabled():
+                return await fn(self, *args, **kwargs)
+
+            key = _make_key(namespace, self, args, kwargs)
+            if key is None:
+                return await fn(self, *args, **kwargs)
+
+            hit = _cache_get(key)
+            if hit is not None:
+                result = dict(hit)
+                result["cache_hit"] = True
+                return result
+
+            result = await fn(self, *args, **kwargs)
+            if isinstance(result, dict) and "error" not in result:
+                _cache_put(key, result)
+            return result
+
+        return wrapper
+
+    return deco
@@ -0,0 +1,53 @@
+import random
+from typing import Any, Optional
+
+# Shared retry policy for the API adapters.
+# Exponential backoff with jitter avoids synchronized retry storms when a
+# benchmark fans several adapters out against the same endpoint, and error
+# classification stops us burning ~seconds of sleeps on 4xx responses that
+# will never succeed.
+
+
+class HTTPStatusError(RuntimeError):
+    """
+    HTTP-level failure carrying enough structure for retry classification
+    (plain RuntimeError strings force callers to grep messages).
+    """
+
+    def __init__(self, message: str, *, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    429 and 5xx are transient; other 4xx are request bugs and retrying them
+    only wastes quota. Non-HTTP failures (timeouts, resets, truncated JSON)
+    get the benefit of the doubt.
+    """
+    if isinstance(exc, HTTPStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return True
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds form only)."""
+    try:
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(
+    attempt: int,
+    *,
+    base: float = 1.0,
+    cap: float = 30.0,
+    retry_after: Optional[float] = None,
+) -> float:
+    """Exponential backoff with 0-50% jitter, honoring Retry-After when larger."""
+    delay = min(cap, base * (2 ** attempt)) * (1.0 + random.uniform(0.0, 0.5))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
@@ -1,13 +1,27 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, Protocol, runtime_checkable
+
+
+@runtime_checkable
+class SupportsOCR(Protocol):
+    """
+    Structural form of the adapter contract, for call sites that dispatch on
+    capability instead of inheritance (isinstance check stays O(1) on the
+    method table rather than walking an MRO).
+    """
+
+    def run(self, image_bytes: bytes, filename: str, mime_type: str) -> Dict[str, Any]: ...
 
 
 class OCRAdapter(ABC):
     """
     Standard adapter interface.
-    All adapters must implement run() with the same signature.
+    All adapters must implement run() with the same signature; callers
+    always pass image_bytes/filename/mime_type as keywords (see main.py),
+    so adapters must not scavenge bytes from alternate kwarg names.
 
     NOTE:
     - Many adapters are blocking (CPU / torch) -> called via threadpool.
@@ -21,6 +35,11 @@ class OCRAdapter(ABC):
     async def run_async(self, image_bytes: bytes, filename: str, mime_type: str) -> Dict[str, Any]:
         """
         Optional async version (for API/network adapters).
-        Default fallback just calls sync run().
+        Default fallback runs sync run() in a worker thread so a blocking
+        CPU adapter (Paddle, torch) can't stall the event loop — benchmark
+        fan-out then genuinely overlaps local inference with API calls
+        instead of paying their sum.
         """
-        return self.run(image_bytes=image_bytes, filename=filename, mime_type=mime_type)
\ No newline at end of file
+        return await asyncio.to_thread(
+            self.run, image_bytes=image_bytes, filename=filename, mime_type=mime_type
+        )
\ No newline at end of file
@@ -0,0 +1,31 @@
+from typing import Any, Dict
+
+from .base import OCRAdapter
+
+# Precomputed once at import: the dummy exists to measure framework overhead
+# (routing, threadpool, billing, JSON sanitize), so its own run() should cost
+# as close to zero as possible — no per-call dict literal construction.
+_RESPONSE: Dict[str, Any] = {
+    "model": "dummy",
+    "latency_ms": 0,
+    "raw": {},
+    "text": "(dummy) no OCR performed",
+    "lines": [],
+}
+
+
+class DummyAdapter(OCRAdapter):
+    """
+    Zero-work baseline adapter. Benchmarks against it show the fixed
+    per-request cost of the backend itself, independent of any OCR engine.
+    """
+
+    @property
+    def name(self) -> str:
+        return "dummy"
+
+    def run(self, image_bytes: bytes = b"", filename: str = "", mime_type: str = "", **kwargs) -> Dict[str, Any]:
+        r = _RESPONSE.copy()
+        r["filename"] = filename
+        r["mime_type"] = mime_type
+        return r
@@ -1,3 +1,5 @@
+import os
+import threading
 import time
 from typing import Any, Dict, Optional, List, Tuple
 
@@ -8,21 +10,326 @@ import easyocr
 import numpy as np
 
 from .base import OCRAdapter
-from .postprocess_markdown import normalize_to_markdown
+from ._raster import pdf_pages_to_rgb
+from ._result_cache import cached
+from .postprocess_markdown import TokensSoA, normalize_to_markdown
 
 
 Token = Tuple[str, float, float, float, float]  # (text, x1, y1, x2, y2)
 
+# Optional SIMD JPEG decoder (pip install PyTurboJPEG); cv2 covers the rest.
+try:
+    from turbojpeg import TurboJPEG
+
+    _TURBOJPEG = TurboJPEG()
+except Exception:
+    _TURBOJPEG = None
+
+
+def _decode_rgb(image_bytes: bytes, mime_type: str = "") -> "np.ndarray":
+    """
+    Decode image bytes to an RGB ndarray without the PIL double-copy
+    (PIL buffer -> Image object -> np.array). TurboJPEG handles jpegs when
+    available, cv2.imdecode everything else; PIL stays as the last resort
+    for formats OpenCV can't read.
+    """
+    mt = (mime_type or "").lower()
+
+    if _TURBOJPEG is not None and ("jpeg" in mt or "jpg" in mt):
+        try:
+            import cv2
+
+            return cv2.cvtColor(_TURBOJPEG.decode(image_bytes), cv2.COLOR_BGR2RGB)
+        except Exception:
+            pass
+
+    try:
+        import cv2
+
+        arr = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if arr is not None:
+            return cv2.cvtColor(arr, cv2.COLOR_BGR2RGB)
+    except Exception:
+        pass
+
+    return np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+
+
+def _binarize_rgb(img: "np.ndarray") -> "np.ndarray":
+    """
+    Otsu-binarize an RGB ndarray before recognition (EASYOCR_BINARIZE=1).
+    OpenCV's grayscale + Otsu run in SIMD-vectorized C, so this is much
+    cheaper than the scalar threshold work readtext would redo internally,
+    and a clean bilevel input helps the recognizer on noisy scans.
+    """
+    import cv2
+
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # readtext wants 3 channels; broadcast is a view, so no extra copy until easyocr reads it
+    return np.broadcast_to(binary[:, :, None], (*binary.shape, 3))
+
+
+def _pdf_pages_to_ndarrays(pdf_bytes: bytes, zoom: float = 200 / 72.0) -> List["np.ndarray"]:
+    """
+    Render ALL pages of a PDF to RGB ndarrays via the shared rasterizer, so
+    a benchmark run that also hits Paddle renders the PDF exactly once.
+    The returned arrays are shared -> read-only (see _raster).
+    """
+    return pdf_pages_to_rgb(pdf_bytes, zoom=zoom)
+
+
+def _quantize_recognizer(reader) -> None:
+    """
+    INT8 dynamic quantization of the CRNN recognizer (EASYOCR_INT8=1).
+    Recognition dominates EasyOCR latency; quantizing the Linear/LSTM layers
+    halves the weight bytes moved and roughly doubles throughput on CPUs
+    with INT8 dot-product support, at typically <0.5% CER cost. CPU only.
+    """
+    try:
+        import torch
+
+        reader.recognizer = torch.quantization.quantize_dynamic(
+            reader.recognizer,
+            {torch.nn.Linear, torch.nn.LSTM},
+            dtype=torch.qint8,
+        )
+    except Exception:
+        pass  # keep the FP32 recognizer if quantization is unavailable
+
+
+def _pool_worker_loop(task_q, result_q):
+    """
+    Worker-process loop: owns its own Reader (torch inference is not
+    thread-safe, and one Reader per process sidesteps the GIL entirely).
+    Reader init (>1s) happens once per worker, not per image.
+    """
+    import easyocr as _easyocr  # re-import inside the child process
+
+    reader = _easyocr.Reader(["en"], gpu=False)
+    if os.getenv("EASYOCR_INT8", "0").strip() == "1":
+        _quantize_recognizer(reader)
+    binarize = os.getenv("EASYOCR_BINARIZE", "0").strip() == "1"
+    while True:
+        job = task_q.get()
+        if job is None:  # shutdown sentinel
+            break
+        job_id, payload = job
+        try:
+            # payload is encoded image bytes, or an already-rasterized RGB
+            # page ndarray (the PDF path ships pages straight across)
+            img = _decode_rgb(payload) if isinstance(payload, (bytes, bytearray)) else payload
+            if binarize:
+                img = _binarize_rgb(img)
+            results = reader.readtext(img)
+            result_q.put((job_id, results, None))
+        except Exception as e:
+            result_q.put((job_id, None, repr(e)))
+
+
+class EasyOCRPool:
+    """
+    Persistent pool of EasyOCR worker processes (EASYOCR_WORKERS > 0).
+    Process-level parallelism scales CPU inference with cores instead of
+    being serialized by the GIL in the FastAPI threadpool.
+    """
+
+    _instance: Optional["EasyOCRPool"] = None
+    # run() executes on threadpool workers, so first requests race here;
+    # double-checked lock (same pattern as paddle's _OCR_LOCK) keeps two of
+    # them from each spawning a full set of worker processes.
+    _instance_lock = threading.Lock()
+
+    def __init__(self, workers: int):
+        import multiprocessing as mp
+
+        ctx = mp.get_context("spawn")
+        self._task_q = ctx.Queue(maxsize=int(os.getenv("EASYOCR_BATCH_SIZE", "32")))
+        self._result_q = ctx.Queue()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # job_id -> Future, registered before submit; one dedicated drain
+        # thread completes them. Submitters never touch the result queue, so
+        # two threads can't race each other's results off it (a submitter
+        # parked in get() while another drained its result would have waited
+        # forever).
+        self._pending: Dict[int, Any] = {}
+
+        self._procs = []
+        for _ in range(workers):
+            p = ctx.Process(target=_pool_worker_loop, args=(self._task_q, self._result_q), daemon=True)
+            p.start()
+            self._procs.append(p)
+
+        threading.Thread(target=self._drain_loop, daemon=True).start()
+
+    def _drain_loop(self):
+        while True:
+            job_id, results, err = self._result_q.get()
+            with self._lock:
+                fut = self._pending.pop(job_id, None)
+            if fut is None:
+                continue
+            if err is not None:
+                fut.set_exception(RuntimeError(f"EasyOCR worker failed: {err}"))
+            else:
+                fut.set_result(results)
+
+    @classmethod
+    def get(cls) -> Optional["EasyOCRPool"]:
+        workers = int(os.getenv("EASYOCR_WORKERS", "0"))
+        if workers <= 0:
+            return None
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(workers)
+        return cls._instance
+
+    def submit_async(self, payload):
+        """
+        Enqueue one job (image bytes or an RGB page ndarray); returns a
+        Future resolving to the raw readtext results.
+        """
+        from concurrent.futures import Future
+
+        fut: Future = Future()
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            # register BEFORE enqueueing so the drain thread can't see the
+            # result of a job it doesn't know about yet
+            self._pending[job_id] = fut
+        self._task_q.put((job_id, payload))
+        return fut
+
+    def submit(self, payload):
+        """Blocking submit/await: returns the raw readtext results."""
+        return self.submit_async(payload).result()
+
+
+class EasyOCRPipeline:
+    """
+    Shared three-stage pipeline (EASYOCR_PIPELINE=1):
+        rasterize (PDF -> page bytes) -> decode (bytes -> ndarray) -> readtext
+
+    Stages run on their own threads connected by bounded queues, so PyMuPDF
+    rasterization and image decode overlap with Reader inference instead of
+    running strictly sequentially per request. The OCR stage drains its queue
+    into a micro-batch (size- or age-triggered) before calling the Reader.
+    """
+
+    _instance: Optional["EasyOCRPipeline"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, adapter: "EasyOCRAdapter"):
+        import queue
+
+        self._adapter = adapter
+        self._raster_q: "queue.Queue" = queue.Queue(maxsize=8)
+        self._decode_q: "queue.Queue" = queue.Queue(maxsize=8)
+        self._ocr_q: "queue.Queue" = queue.Queue(maxsize=8)
+
+        self.batch = int(os.getenv("EASYOCR_PIPELINE_BATCH", "4"))
+        self.max_wait_s = float(os.getenv("EASYOCR_PIPELINE_MAX_WAIT_MS", "25")) / 1000.0
+
+        for target in (self._rasterize_loop, self._decode_loop, self._ocr_loop):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+
+    @classmethod
+    def get(cls, adapter: "EasyOCRAdapter") -> Optional["EasyOCRPipeline"]:
+        if os.getenv("EASYOCR_PIPELINE", "0").strip() != "1":
+            return None
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(adapter)
+        return cls._instance
+
+    def submit(self, image_bytes: bytes, mime_type: str):
+        """Enqueue one document; returns a Future resolving to readtext results."""
+        from concurrent.futures import Future
+
+        fut: Future = Future()
+        self._raster_q.put((fut, image_bytes, mime_type))
+        return fut
+
+    def _rasterize_loop(self):
+        while True:
+            fut, data, mime_type = self._raster_q.get()
+            try:
+                if mime_type == "application/pdf":
+                    import fitz  # PyMuPDF
+
+                    doc = fitz.open(stream=data, filetype="pdf")
+                    try:
+                        pix = doc.load_page(0).get_pixmap(matrix=fitz.Matrix(200 / 72.0, 200 / 72.0), alpha=False)
+                        data = pix.tobytes("png")
+                    finally:
+                        doc.close()
+                self._decode_q.put((fut, data))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def _decode_loop(self):
+        while True:
+            fut, data = self._decode_q.get()
+            try:
+                img = _decode_rgb(data)
+                if self._adapter.binarize:
+                    img = _binarize_rgb(img)
+                self._ocr_q.put((fut, img, time.monotonic()))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def _ocr_loop(self):
+        import queue
+
+        while True:
+            batch = [self._ocr_q.get()]
+            oldest_ts = batch[0][2]
+            # dynamic micro-batch: fill until size or age trips
+            while len(batch) < self.batch:
+                remaining = self.max_wait_s - (time.monotonic() - oldest_ts)
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._ocr_q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            for fut, img, _ in batch:
+                try:
+                    fut.set_result(self._adapter.reader.readtext(img))
+                except Exception as e:
+                    fut.set_exception(e)
+
 
 class EasyOCRAdapter(OCRAdapter):
     def __init__(self):
-        # Lazy-ish init could be added later; keep stable for now
-        self.reader = easyocr.Reader(["en"], gpu=False)
+        # GPU path (EASYOCR_GPU=1): batched CRAFT detection + CRNN recognition on CUDA.
+        # cudnn_benchmark lets cuDNN pick the fastest kernels for our fixed batch shapes.
+        self.use_gpu = os.getenv("EASYOCR_GPU", "0").strip() == "1"
+        self.batch_width = int(os.getenv("EASYOCR_BATCH_WIDTH", "1280"))
+        self.batch_height = int(os.getenv("EASYOCR_BATCH_HEIGHT", "1280"))
+        self.binarize = os.getenv("EASYOCR_BINARIZE", "0").strip() == "1"
+        self._warmed_up = False
+
+        # With a worker pool (EASYOCR_WORKERS > 0) each child owns its Reader,
+        # so don't pay the >1s init + model RSS in the parent too.
+        if EasyOCRPool.get() is not None and not self.use_gpu:
+            self.reader = None
+        else:
+            self.reader = easyocr.Reader(["en"], gpu=self.use_gpu, cudnn_benchmark=self.use_gpu)
+            if not self.use_gpu and os.getenv("EASYOCR_INT8", "0").strip() == "1":
+                _quantize_recognizer(self.reader)
 
     @property
     def name(self) -> str:
         return "easyocr"
 
+    @cached("easyocr")
     def run(
         self,
         image_bytes: Optional[bytes] = None,
@@ -30,34 +337,159 @@ class EasyOCRAdapter(OCRAdapter):
         mime_type: str = "",
         **kwargs,
     ) -> Dict[str, Any]:
-        # accept bytes from various keys
         if image_bytes is None:
-            for key in ("file_bytes", "bytes", "image", "content", "data"):
-                if key in kwargs and kwargs[key] is not None:
-                    image_bytes = kwargs[key]
-                    break
-
-        if image_bytes is None:
-            raise RuntimeError(
-                f"EasyOCRAdapter.run() did not receive bytes. keys={list(kwargs.keys())}"
-            )
+            raise RuntimeError("EasyOCRAdapter.run() did not receive image bytes")
 
         mt = (mime_type or "").strip().lower()
 
         # IMPORTANT:
         # main.py already converts PDF -> PNG for IMG_ONLY_MODELS.
-        # So adapters should NOT do PDF conversion again.
+        # Direct callers may still hand us a PDF -> take the all-pages path.
+        if mt == "application/pdf":
+            return self.run_pdf(image_bytes, filename=filename)
+
+        t0 = time.time()
+
+        pool = EasyOCRPool.get()
+        pipeline = EasyOCRPipeline.get(self) if pool is None else None
+        if pool is not None:
+            results = pool.submit(image_bytes)
+        elif pipeline is not None:
+            results = pipeline.submit(image_bytes, mt).result()
+        else:
+            img = _decode_rgb(image_bytes, mt)
+            if self.binarize:
+                img = _binarize_rgb(img)
+            results = self.reader.readtext(img)
+
+        extracted_text, lines = self._parse_results(results)
+
+        latency_ms = (time.time() - t0) * 1000.0
+
+        return {
+            "model": self.name,
+            "filename": filename,
+            "mime_type": mt,
+            "backend_latency_ms": latency_ms,
+            "latency_ms": latency_ms,
+            "raw": results,
+            "text": extracted_text,
+            "lines": lines,
+        }
 
+    def run_pdf(self, pdf_bytes: bytes, filename: str = "") -> Dict[str, Any]:
+        """
+        OCR every page of a PDF. Pages are rasterized concurrently straight
+        to ndarrays (no PNG round-trip) and recognized per page.
+        """
         t0 = time.time()
 
-        pil_img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img = np.array(pil_img)
+        pages = _pdf_pages_to_ndarrays(pdf_bytes)
+
+        # In pool mode (EASYOCR_WORKERS > 0, CPU) the parent owns no Reader,
+        # so pages go to the worker processes instead — all fanned out at
+        # once, so a multi-page PDF scales across workers. Workers apply
+        # EASYOCR_BINARIZE themselves on this path.
+        pool = EasyOCRPool.get() if self.reader is None else None
+        if pool is not None:
+            futs = [pool.submit_async(img) for img in pages]
+            page_results = [f.result() for f in futs]
+        else:
+            page_results = []
+            for img in pages:
+                if self.binarize:
+                    img = _binarize_rgb(img)
+                page_results.append(self.reader.readtext(np.ascontiguousarray(img)))
 
-        results = self.reader.readtext(img)
+        all_lines: List[Dict[str, Any]] = []
+        page_texts: List[str] = []
+        raw_pages = []
+        for results in page_results:
+            text, lines = self._parse_results(results)
+            page_texts.append(text)
+            all_lines.extend(lines)
+            raw_pages.append(results)
 
+        latency_ms = (time.time() - t0) * 1000.0
+
+        return {
+            "model": self.name,
+            "filename": filename,
+            "mime_type": "application/pdf",
+            "backend_latency_ms": latency_ms,
+            "latency_ms": latency_ms,
+            "raw": raw_pages,
+            "text": "\n\n---\n\n".join(t for t in page_texts if t.strip()).strip(),
+            "lines": all_lines,
+            "page_count": len(pages),
+        }
+
+    def run_many(self, images_bytes: List[bytes], filenames: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Batched multi-image path (GPU only).
+        Decodes all images, resizes to a uniform (H, W), stacks into one tensor
+        and runs detection+recognition in a single readtext_batched call.
+        Falls back to per-image run() on CPU (batching buys nothing there).
+        """
+        filenames = filenames or ["" for _ in images_bytes]
+
+        if not self.use_gpu or len(images_bytes) <= 1:
+            return [
+                self.run(image_bytes=b, filename=fn, mime_type="image/png")
+                for b, fn in zip(images_bytes, filenames)
+            ]
+
+        t0 = time.time()
+
+        w, h = self.batch_width, self.batch_height
+        import cv2
+
+        imgs = []
+        for b in images_bytes:
+            img = _decode_rgb(b)
+            # skip the interpolation pass when the frame is already batch-sized
+            if img.shape[1] != w or img.shape[0] != h:
+                img = cv2.resize(img, (w, h))
+            imgs.append(img)
+        stacked = np.stack(imgs)
+
+        # One-time warmup so cuDNN autotuning doesn't land on the first real request
+        if not self._warmed_up:
+            try:
+                self.reader.readtext_batched(
+                    np.zeros([len(imgs), h, w, 3], dtype=np.uint8),
+                    n_width=w,
+                    n_height=h,
+                )
+            except Exception:
+                pass
+            self._warmed_up = True
+
+        batched = self.reader.readtext_batched(stacked, n_width=w, n_height=h)
+
+        out: List[Dict[str, Any]] = []
+        for results, fn in zip(batched, filenames):
+            extracted_text, lines = self._parse_results(results)
+            latency_ms = (time.time() - t0) * 1000.0 / max(len(imgs), 1)
+            out.append(
+                {
+                    "model": self.name,
+                    "filename": fn,
+                    "mime_type": "image/png",
+                    "backend_latency_ms": latency_ms,
+                    "latency_ms": latency_ms,
+                    "raw": results,
+                    "text": extracted_text,
+                    "lines": lines,
+                }
+            )
+        return out
+
+    def _parse_results(self, results) -> Tuple[str, List[Dict[str, Any]]]:
         lines = []
         text_chunks: List[str] = []
         tokens: List[Token] = []
+        kept_boxes = []
 
         for (bbox, txt, conf) in results:
             txt = str(txt).strip()
@@ -66,28 +498,41 @@ class EasyOCRAdapter(OCRAdapter):
 
             text_chunks.append(txt)
             lines.append({"text": txt, "score": float(conf), "bbox": bbox})
+            kept_boxes.append(bbox)
 
+        # One C-level min/max over all polygons at once instead of a Python
+        # min()/max() pair per box (the boxes are always 4 points each).
+        if kept_boxes:
             try:
-                xs = [p[0] for p in bbox]
-                ys = [p[1] for p in bbox]
-                x1, x2 = float(min(xs)), float(max(xs))
-                y1, y2 = float(min(ys)), float(max(ys))
-                tokens.append((txt, x1, y1, x2, y2))
+                polys = np.asarray(kept_boxes, dtype=np.float32).reshape(len(kept_boxes), -1, 2)
+                mins = polys.min(axis=1)
+                maxs = polys.max(axis=1)
+                # SoA layout: column arrays feed vectorized row clustering
+                # downstream instead of per-token tuples
+                tokens = TokensSoA(
+                    x1=mins[:, 0],
+                    y1=mins[:, 1],
+                    x2=maxs[:, 0],
+                    y2=maxs[:, 1],
+                    score=np.asarray([ln["score"] for ln in lines], dtype=np.float32),
+                    text=[ln["text"] for ln in lines],
+                )
+                # native Python floats in one C call, so main.py's JSON
+                # sanitizer never has to walk numpy scalars per point
+                for ln, box in zip(lines, polys.tolist()):
+                    ln["bbox"] = box
             except Exception:
-                pass
+                # ragged/odd polygons -> per-box fallback
+                for ln, bbox in zip(lines, kept_boxes):
+                    try:
+                        box = np.asarray(bbox, dtype=np.float32)
+                        mn = box.min(axis=0)
+                        mx = box.max(axis=0)
+                        tokens.append((ln["text"], float(mn[0]), float(mn[1]), float(mx[0]), float(mx[1])))
+                        ln["bbox"] = box.tolist()
+                    except Exception:
+                        pass
 
         extracted_plain = "\n".join(text_chunks).strip()
         extracted_text = normalize_to_markdown(extracted_plain, tokens=tokens)
-
-        latency_ms = (time.time() - t0) * 1000.0
-
-        return {
-            "model": self.name,
-            "filename": filename,
-            "mime_type": mt,
-            "backend_latency_ms": latency_ms,
-            "latency_ms": latency_ms,
-            "raw": results,
-            "text": extracted_text,
-            "lines": lines,
-        }
\ No newline at end of file
+        return extracted_text, lines
\ No newline at end of file
@@ -1,62 +1,42 @@
+import io
 import os
 import time
+import hashlib
+from functools import lru_cache
 from typing import Any, Dict, List
 
 from .base import OCRAdapter
-from .postprocess_markdown import normalize_to_markdown
+from ._preocr import extract_pdf_text_layer
+from ._result_cache import cached, cached_async
+from .postprocess_markdown import clean_and_linify
 
 from google import genai
 
 
-def _clean_ocr_text(s: str) -> str:
-    if not s:
-        return ""
-    s = str(s).strip()
-
-    bad_prefixes = (
-        "here is the extracted text",
-        "extracted text",
-        "ocr output",
-        "output",
-        "result",
-    )
-    lines = [ln.rstrip() for ln in s.splitlines()]
-
-    if "```" in s:
-        parts = s.split("```")
-        if len(parts) >= 3:
-            middle = max(parts[1:-1], key=len).strip()
-            middle_lines = middle.splitlines()
-            if middle_lines and len(middle_lines[0].strip()) <= 12 and middle_lines[0].strip().isalpha():
-                middle = "\n".join(middle_lines[1:]).strip()
-            s = middle
-            lines = [ln.rstrip() for ln in s.splitlines()]
-
-    cleaned: List[str] = []
-    for i, ln in enumerate(lines):
-        t = ln.strip()
-        if not t:
-            cleaned.append("")
-            continue
-        low = t.lower().rstrip(":")
-        if i == 0 and low in bad_prefixes:
-            continue
-        if low in {"markdown", "json", "text"} and len(t) <= 12:
-            continue
-        cleaned.append(ln.rstrip())
-
-    return "\n".join(cleaned).strip()
-
-
-def _text_to_lines(text: str) -> List[Dict[str, Any]]:
-    if not text:
-        return []
-    t = str(text).replace("\r", "").strip("\n")
-    if not t.strip():
-        return []
-    parts = [ln.rstrip() for ln in t.split("\n")]
-    parts = [ln for ln in parts if ln.strip()]
-    return [{"text": ln, "score": None, "box": None} for ln in parts]
+_PROMPT_OCR = (
+    "You are a high-accuracy OCR engine.\n"
+    "Extract ALL visible text from the document.\n\n"
+    "OUTPUT FORMAT (VERY IMPORTANT):\n"
+    "- Output MUST be ONLY the extracted content.\n"
+    "- Use Markdown to preserve structure:\n"
+    "  * Use headings for section titles if present.\n"
+    "  * If there is any table (invoice items, totals, etc.), output it as a proper Markdown table with | pipes.\n"
+    "  * Preserve line breaks.\n"
+    "- Do NOT add commentary, explanations, or analysis.\n"
+    "- Do NOT say 'here is the extracted text'.\n"
+    "- Do NOT use code fences (no ```).\n"
+    "- Do NOT output JSON.\n\n"
+    "QUALITY RULES:\n"
+    "- Keep numbers exactly as seen (commas/decimals/currency).\n"
+    "- Do not hallucinate missing values.\n"
+)
+
+
+@lru_cache(maxsize=1)
+def _genai_client(api_key: str) -> "genai.Client":
+    # Process-wide singleton: SDK init + TLS warmup happen once, and the
+    # underlying connection pool persists even if adapters are re-created.
+    return genai.Client(api_key=api_key)
 
 
 class Gemini3ProAdapter(OCRAdapter):
@@ -65,54 +45,56 @@ class Gemini3ProAdapter(OCRAdapter):
         if not api_key:
             raise RuntimeError("GEMINI_API_KEY missing in environment (.env).")
 
-        self.client = genai.Client(api_key=api_key)
+        self.client = _genai_client(api_key)
         self.model_id = "gemini-3-pro-preview"
 
-    def run(self, *, filename: str, mime_type: str, image_bytes: bytes, **kwargs) -> Dict[str, Any]:
-        t0 = time.time()
-
-        prompt = (
-            "You are a high-accuracy OCR engine.\n"
-            "Extract ALL visible text from the document.\n\n"
-            "OUTPUT FORMAT (VERY IMPORTANT):\n"
-            "- Output MUST be ONLY the extracted content.\n"
-            "- Use Markdown to preserve structure:\n"
-            "  * Use headings for section titles if present.\n"
-            "  * If there is any table (invoice items, totals, etc.), output it as a proper Markdown table with | pipes.\n"
-            "  * Preserve line breaks.\n"
-            "- Do NOT add commentary, explanations, or analysis.\n"
-            "- Do NOT say 'here is the extracted text'.\n"
-            "- Do NOT use code fences (no ```).\n"
-            "- Do NOT output JSON.\n\n"
-            "QUALITY RULES:\n"
-            "- Keep numbers exactly as seen (commas/decimals/currency).\n"
-            "- Do not hallucinate missing values.\n"
-        )
-
-        contents = [
-            {"inline_data": {"mime_type": mime_type, "data": image_bytes}},
-            {"text": prompt},
-        ]
-
-        resp = self.client.models.generate_content(
-            model=self.model_id,
-            contents=contents,
-        )
-
+        # Files API upload (GEMINI_USE_FILES_API=1): raw multipart instead of
+        # base64-in-JSON (-25% egress); uploads cached by content digest.
+        self.use_files_api = os.getenv("GEMINI_USE_FILES_API", "0").strip() == "1"
+        self._file_cache: Dict[bytes, Any] = {}
+
+        # GEMINI_STREAM=1: accumulate chunks as they arrive instead of
+        # blocking on the full response (same flag as Gemini3's SSE path).
+        self.stream_responses = os.getenv("GEMINI_STREAM", "0").strip() == "1"
+
+    def _data_part(self, image_bytes: bytes, mime_type: str) -> Any:
+        if self.use_files_api:
+            try:
+                key = hashlib.blake2b(image_bytes, digest_size=16).digest()
+                f = self._file_cache.get(key)
+                if f is None:
+                    f = self.client.files.upload(
+                        file=io.BytesIO(image_bytes),
+                        config={"mime_type": mime_type},
+                    )
+                    self._file_cache[key] = f
+                return f
+            except Exception:
+                pass  # fall back to inline bytes below
+        return {"inline_data": {"mime_type": mime_type, "data": image_bytes}}
+
+    def _build_result(self, resp, *, filename: str, mime_type: str, t0: float) -> Dict[str, Any]:
         text = getattr(resp, "text", "") or ""
-        text = _clean_ocr_text(text)
-        text = normalize_to_markdown(text)
+        text, lines = clean_and_linify(text)
 
-        lines = _text_to_lines(text)
         latency_ms = (time.time() - t0) * 1000.0
 
-        # IMPORTANT: keep raw small
+        # IMPORTANT: keep raw small. Serializing the full envelope via
+        # to_dict() re-materializes the whole OCR text (and any inline data)
+        # just to pull out usage, so read the usage object directly and only
+        # dump everything when explicitly asked (OCR_KEEP_RAW=1).
         raw_small: Dict[str, Any] = {"model": self.model_id}
         try:
-            # Some SDK responses expose usageMetadata-ish content in dict
-            if hasattr(resp, "to_dict"):
-                d = resp.to_dict()
-                raw_small["usage"] = d.get("usageMetadata") or d.get("usage_metadata")
+            um = getattr(resp, "usage_metadata", None)
+            if um is not None:
+                if hasattr(um, "model_dump"):
+                    raw_small["usage"] = um.model_dump(exclude_none=True)
+                elif hasattr(um, "to_json_dict"):
+                    raw_small["usage"] = um.to_json_dict()
+                else:
+                    raw_small["usage"] = str(um)
+            if os.getenv("OCR_KEEP_RAW", "0").strip() == "1" and hasattr(resp, "to_dict"):
+                raw_small["full"] = resp.to_dict()
         except Exception:
             pass
 
@@ -126,4 +108,107 @@ class Gemini3ProAdapter(OCRAdapter):
             "raw": raw_small,
             "lines": lines,
             "line_count": len(lines),
-        }
\ No newline at end of file
+        }
+
+    @cached("gemini3pro")
+    def run(self, *, filename: str, mime_type: str, image_bytes: bytes, **kwargs) -> Dict[str, Any]:
+        t0 = time.time()
+
+        # Digital PDFs with a real text layer skip the model call entirely
+        if mime_type == "application/pdf":
+            pre = extract_pdf_text_layer(image_bytes)
+            if pre is not None:
+                text, lines = clean_and_linify(pre)
+                latency_ms = (time.time() - t0) * 1000.0
+                return {
+                    "model": "gemini3pro+preocr",
+                    "filename": filename,
+                    "mime_type": mime_type,
+                    "backend_latency_ms": latency_ms,
+                    "latency_ms": latency_ms,
+                    "text": text,
+                    "raw": {"model": self.model_id, "preocr": True},
+                    "lines": lines,
+                    "line_count": len(lines),
+                }
+
+        contents = [
+            self._data_part(image_bytes, mime_type),
+            {"text": _PROMPT_OCR},
+        ]
+
+        if self.stream_responses:
+            resp = self._collect_stream(contents)
+        else:
+            resp = self.client.models.generate_content(
+                model=self.model_id,
+                contents=contents,
+            )
+
+        return self._build_result(resp, filename=filename, mime_type=mime_type, t0=t0)
+
+    def _collect_stream(self, contents) -> Any:
+        """Drain generate_content_stream into a response-shaped stand-in."""
+        from types import SimpleNamespace
+
+        pieces: List[str] = []
+        last = None
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model_id,
+            contents=contents,
+        ):
+            t = getattr(chunk, "text", None)
+            if t:
+                pieces.append(t)
+            last = chunk
+
+        return SimpleNamespace(
+            text="".join(pieces),
+            usage_metadata=getattr(last, "usage_metadata", None),
+        )
+
+    async def _collect_stream_async(self, contents) -> Any:
+        """Async twin of _collect_stream (client.aio streaming)."""
+        from types import SimpleNamespace
+
+        pieces: List[str] = []
+        last = None
+        async for chunk in await self.client.aio.models.generate_content_stream(
+            model=self.model_id,
+            contents=contents,
+        ):
+            t = getattr(chunk, "text", None)
+            if t:
+                pieces.append(t)
+            last = chunk
+
+        return SimpleNamespace(
+            text="".join(pieces),
+            usage_metadata=getattr(last, "usage_metadata", None),
+        )
+
+    @cached_async("gemini3pro")
+    async def run_async(self, image_bytes: bytes, filename: str = "", mime_type: str = "", **kwargs) -> Dict[str, Any]:
+        """
+        Async SDK path (client.aio): awaited on the event loop so benchmark
+        fan-out across API models runs concurrently instead of serially.
+        """
+        import asyncio
+
+        t0 = time.time()
+
+        # Files API upload (if enabled) is blocking SDK I/O -> push to a thread
+        data_part = await asyncio.to_thread(self._data_part, image_bytes, mime_type)
+        contents = [data_part, {"text": _PROMPT_OCR}]
+
+        # GEMINI_STREAM=1 applies here too: run_async is what the server
+        # dispatches, so the flag can't live only on the sync path.
+        if self.stream_responses:
+            resp = await self._collect_stream_async(contents)
+        else:
+            resp = await self.client.aio.models.generate_content(
+                model=self.model_id,
+                contents=contents,
+            )
+
+        return self._build_result(resp, filename=filename, mime_type=mime_type, t0=t0)
\ No newline at end of file
@@ -1,50 +1,195 @@
 import os
+import re
 import time
 import base64
+import asyncio
+import threading
 import requests
 from typing import Any, Dict, Optional, List
 
 from .base import OCRAdapter
+from ._result_cache import cached, cached_async
+from ._retry import backoff_delay, parse_retry_after
 from .postprocess_markdown import normalize_to_markdown
 
+# orjson serializes the (large, base64-heavy) payload and decodes the page
+# markdown 3-5x faster than stdlib json; fall back gracefully when missing.
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+import json as _stdlib_json
+
+# pybase64 wraps SIMD base64 (SSSE3/AVX2), ~4-10x faster than stdlib on the
+# multi-MB buffers we encode per request; stdlib is a drop-in fallback.
+try:
+    import pybase64 as _b64
+except Exception:
+    _b64 = base64
+
+
+def _dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return _stdlib_json.dumps(payload).encode()
+
+
+def _loads(content: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(content)
+    return _stdlib_json.loads(content)
+
+
+# Pacing for the async path: main.py's API_SEM caps cross-model concurrency,
+# but page/batch fan-out inside one benchmark can still burst this endpoint.
+# The semaphore caps in-flight calls; MISTRAL_OCR_RPS (0 = off) spaces them.
+_SEM: Optional[asyncio.Semaphore] = None
+_RATE_LOCK: Optional[asyncio.Lock] = None
+_NEXT_CALL_AT = 0.0
+
+
+def _get_sem() -> asyncio.Semaphore:
+    global _SEM
+    if _SEM is None:
+        _SEM = asyncio.Semaphore(int(os.getenv("MISTRAL_OCR_CONCURRENCY", "8")))
+    return _SEM
+
+
+async def _respect_rate() -> None:
+    global _RATE_LOCK, _NEXT_CALL_AT
+    rps = float(os.getenv("MISTRAL_OCR_RPS", "0"))
+    if rps <= 0:
+        return
+    if _RATE_LOCK is None:
+        _RATE_LOCK = asyncio.Lock()
+    async with _RATE_LOCK:
+        now = asyncio.get_running_loop().time()
+        wait = _NEXT_CALL_AT - now
+        _NEXT_CALL_AT = max(now, _NEXT_CALL_AT) + 1.0 / rps
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+
+def _err_snip(resp: Any) -> str:
+    # bounded error snippet without decoding the whole body (resp.text would)
+    return resp.content[:2000].decode("utf-8", "replace")
+
+
+# whitespace + both quote styles stripped in one pass instead of chained
+# .strip()/.strip('"')/.strip("'") allocating an intermediate string each
+_STRIP = " \t\r\n\"'"
+
 
 def _clean_endpoint(raw: str) -> str:
     if not raw:
         return ""
-    s = raw.strip().strip('"').strip("'")
-    s = s.replace("%27", "").strip('"').strip("'")
-    s = s.rstrip("/")
-    return s
+    return raw.strip(_STRIP).replace("%27", "").strip(_STRIP).rstrip("/")
+
+
+# one C-level scan handles both CRLF and bare-LF line endings, replacing
+# the replace("\r","") pre-pass that copied the whole blob first
+_SPLIT_RE = re.compile(r"\r\n?|\n")
 
 
 def _text_to_lines(text: str) -> List[Dict[str, Any]]:
     if not text:
         return []
-    t = str(text).replace("\r", "").strip("\n")
-    if not t.strip():
-        return []
-    parts = [ln.rstrip() for ln in t.split("\n")]
-    parts = [ln for ln in parts if ln.strip()]
-    return [{"text": ln, "score": None, "box": None} for ln in parts]
+    # single comprehension: split + strip + blank filter + dict build in one pass
+    return [
+        {"text": ln, "score": None, "box": None}
+        for ln in map(str.rstrip, _SPLIT_RE.split(str(text)))
+        if ln.strip()
+    ]
 
 
 class MistralOCRAdapter(OCRAdapter):
     def __init__(self):
         self.endpoint = _clean_endpoint(os.getenv("MISTRAL_OCR_ENDPOINT", ""))
-        self.token = os.getenv("MISTRAL_OCR_TOKEN", "").strip().strip('"').strip("'")
-        self.model = os.getenv("MISTRAL_OCR_MODEL", "mistral-document-ai-2505").strip().strip('"').strip("'")
+        self.token = os.getenv("MISTRAL_OCR_TOKEN", "").strip(_STRIP)
+        self.model = os.getenv("MISTRAL_OCR_MODEL", "mistral-document-ai-2505").strip(_STRIP)
 
         if not self.endpoint:
             raise RuntimeError("MISTRAL_OCR_ENDPOINT is missing in backend/.env")
         if not self.token:
             raise RuntimeError("MISTRAL_OCR_TOKEN is missing in backend/.env")
 
+        # Pooled keep-alive session: reuses the TLS connection across calls
+        # instead of a fresh handshake per request on the hot benchmark loop.
+        # Transport-level retries cover transient 429/5xx and connection
+        # resets with backoff, so run() doesn't need its own retry loop.
         self._session = requests.Session()
+        self._session.mount(
+            "https://",
+            requests.adapters.HTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=10,
+                max_retries=requests.adapters.Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["POST"],
+                    respect_retry_after_header=True,
+                ),
+            ),
+        )
+        self._session.headers.update(
+            {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.token}",
+                "Connection": "keep-alive",
+            }
+        )
+
+        self._aclient = None
+
+        # Pre-warm the pooled connection off the request path so the first
+        # real OCR call doesn't pay DNS + TCP + TLS handshake (~100-300 ms).
+        threading.Thread(target=self._warm, daemon=True).start()
+
+    def _warm(self) -> None:
+        try:
+            self._session.options(self.endpoint, timeout=5)
+        except Exception:
+            # best-effort: endpoints that reject OPTIONS still did the TLS
+            # handshake, and network errors surface on the real call anyway
+            pass
 
     @property
     def name(self) -> str:
         return "mistral"
 
+    def _payload(self, image_bytes: bytes, mime_type: str) -> Dict[str, Any]:
+        # stay in bytes until one final ascii decode: the f-string route
+        # decoded the multi-MB base64 blob and then copied it again into the
+        # formatted string
+        data_url = (
+            b"data:" + mime_type.encode("ascii") + b";base64," + _b64.b64encode(image_bytes)
+        ).decode("ascii")
+        return {
+            "model": self.model,
+            "document": {"type": "document_url", "document_url": data_url},
+            # nothing downstream reads the echo; asking for it doubles the
+            # response size and its JSON-decode time
+            "include_image_base64": False,
+        }
+
+    def _get_aclient(self):
+        # Shared AsyncClient (lazy): keep-alive across calls on the event loop
+        if self._aclient is None:
+            import httpx
+
+            self._aclient = httpx.AsyncClient(
+                timeout=httpx.Timeout(120, connect=10),
+                limits=httpx.Limits(max_keepalive_connections=16),
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.token}",
+                },
+            )
+        return self._aclient
+
+    @cached("mistral")
     def run(
         self,
         image_bytes: Optional[bytes] = None,
@@ -53,72 +198,109 @@ class MistralOCRAdapter(OCRAdapter):
         **kwargs
     ) -> Dict[str, Any]:
         if image_bytes is None:
-            for key in ("file_bytes", "bytes", "image", "content", "data"):
-                if key in kwargs and kwargs[key] is not None:
-                    image_bytes = kwargs[key]
-                    break
+            raise RuntimeError("MistralOCRAdapter.run() did not receive file bytes")
+
+        t0 = time.time()
+        mime_type = (mime_type or "").strip() or "image/png"
+
+        payload = self._payload(image_bytes, mime_type)
+
+        try:
+            resp = self._session.post(self.endpoint, data=_dumps(payload), timeout=120)
+        except Exception as e:
+            raise RuntimeError(f"Mistral OCR request failed: {repr(e)}")
+
+        if resp.status_code >= 400:
+            raise RuntimeError(f"Mistral OCR HTTP {resp.status_code}: {_err_snip(resp)}")
 
+        try:
+            data = _loads(resp.content)
+        except Exception:
+            raise RuntimeError(f"Mistral OCR returned non-JSON response: {_err_snip(resp)}")
+
+        return self._build_result(data, filename, mime_type, t0)
+
+    @cached_async("mistral")
+    async def run_async(
+        self,
+        image_bytes: Optional[bytes] = None,
+        filename: str = "",
+        mime_type: str = "",
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Network-bound path: awaited on the event loop instead of parking a
+        threadpool worker, so benchmark fan-out runs all API models at once.
+        """
         if image_bytes is None:
-            raise RuntimeError(
-                "MistralOCRAdapter.run() did not receive file bytes. "
-                f"Got kwargs keys: {list(kwargs.keys())}"
-            )
+            raise RuntimeError("MistralOCRAdapter.run_async() did not receive file bytes")
 
         t0 = time.time()
-
-        b64 = base64.b64encode(image_bytes).decode("utf-8")
         mime_type = (mime_type or "").strip() or "image/png"
 
-        if mime_type == "application/pdf":
-            data_url = f"data:application/pdf;base64,{b64}"
-        else:
-            data_url = f"data:{mime_type};base64,{b64}"
+        payload = self._payload(image_bytes, mime_type)
+        body = _dumps(payload)
 
-        payload = {
-            "model": self.model,
-            "document": {"type": "document_url", "document_url": data_url},
-            "include_image_base64": True,
-        }
+        # The sync session gets transport-level retries from urllib3; mirror
+        # that here (3 attempts, jittered backoff, 429/5xx only).
+        resp = None
+        last_err: Optional[Exception] = None
+        for attempt in range(3):
+            async with _get_sem():
+                await _respect_rate()
+                try:
+                    resp = await self._get_aclient().post(self.endpoint, content=body)
+                    last_err = None
+                except Exception as e:
+                    last_err = e
+                    resp = None
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.token}",
-        }
+            if resp is not None and resp.status_code not in (429, 500, 502, 503, 504):
+                break
+            if attempt < 2:
+                retry_after = parse_retry_after(resp.headers.get("Retry-After")) if resp is not None else None
+                await asyncio.sleep(backoff_delay(attempt, base=0.5, retry_after=retry_after))
 
-        try:
-            resp = self._session.post(self.endpoint, headers=headers, json=payload, timeout=120)
-        except Exception as e:
-            raise RuntimeError(f"Mistral OCR request failed: {repr(e)}")
+        if resp is None:
+            raise RuntimeError(f"Mistral OCR request failed: {repr(last_err)}")
 
         if resp.status_code >= 400:
-            raise RuntimeError(f"Mistral OCR HTTP {resp.status_code}: {resp.text[:2000]}")
+            raise RuntimeError(f"Mistral OCR HTTP {resp.status_code}: {_err_snip(resp)}")
 
         try:
-            data = resp.json()
+            data = _loads(resp.content)
         except Exception:
-            raise RuntimeError(f"Mistral OCR returned non-JSON response: {resp.text[:2000]}")
+            raise RuntimeError(f"Mistral OCR returned non-JSON response: {_err_snip(resp)}")
 
+        return self._build_result(data, filename, mime_type, t0)
+
+    def _build_result(
+        self, data: Any, filename: str, mime_type: str, t0: float
+    ) -> Dict[str, Any]:
         latency_ms = int((time.time() - t0) * 1000)
 
+        # The schema is known (pages[].markdown); take it in one generator
+        # pass and only fall back to the defensive key scan when the shape
+        # surprises us, instead of isinstance-checking every node every time.
         extracted_text = ""
-        if isinstance(data, dict):
-            pages = data.get("pages")
-            if isinstance(pages, list):
-                chunks: List[str] = []
-                for p in pages:
-                    if isinstance(p, dict):
-                        md = p.get("markdown")
-                        if isinstance(md, str) and md.strip():
-                            chunks.append(md.strip())
-                if chunks:
-                    extracted_text = "\n\n".join(chunks)
-
-            if not extracted_text:
-                for k in ("text", "extracted_text", "content"):
-                    v = data.get(k)
-                    if isinstance(v, str) and v.strip():
-                        extracted_text = v.strip()
-                        break
+        try:
+            extracted_text = "\n\n".join(
+                p["markdown"].strip()
+                for p in data["pages"]
+                if p.get("markdown", "").strip()
+            )
+        except (KeyError, TypeError, AttributeError):
+            pass
+
+        if not extracted_text and isinstance(data, dict):
+            extracted_text = next(
+                (
+                    data[k].strip()
+                    for k in ("text", "extracted_text", "content")
+                    if isinstance(data.get(k), str) and data[k].strip()
+                ),
+                "",
+            )
 
         extracted_text = normalize_to_markdown(extracted_text)
         lines = _text_to_lines(extracted_text)
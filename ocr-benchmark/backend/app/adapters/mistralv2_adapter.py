@@ -7,14 +7,37 @@ from typing import Any, Dict
 
 from .base import OCRAdapter
 
+# orjson serializes the base64-heavy payload and decodes the page markdown
+# 3-5x faster than stdlib json; fall back gracefully when missing.
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+import json as _stdlib_json
+
+
+def _dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return _stdlib_json.dumps(payload).encode()
+
+
+def _loads(content: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(content)
+    return _stdlib_json.loads(content)
+
+
+# whitespace + both quote styles stripped in one pass instead of chained
+# .strip()/.strip('"')/.strip("'") allocating an intermediate string each
+_STRIP = " \t\r\n\"'"
+
 
 def _clean_endpoint(raw: str) -> str:
     if not raw:
         return ""
-    s = raw.strip().strip('"').strip("'")
-    s = s.replace("%27", "").strip('"').strip("'")
-    s = s.rstrip("/")
-    return s
+    return raw.strip(_STRIP).replace("%27", "").strip(_STRIP).rstrip("/")
 
 
 _TAG_RE = re.compile(r"</?[^>]+>")
@@ -51,18 +74,27 @@ class MistralV2Adapter(OCRAdapter):
         if not self.endpoint:
             raise RuntimeError("MISTRALV2_ENDPOINT missing in backend .env")
 
+        # Pooled keep-alive session: one TLS handshake, reused across calls.
         self._session = requests.Session()
+        self._session.mount(
+            "https://",
+            requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10),
+        )
+        self._session.headers.update(
+            {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.api_key}",
+            }
+        )
 
     def run(self, *, filename: str, mime_type: str, image_bytes: bytes, **kwargs) -> Dict[str, Any]:
         t0 = time.time()
 
-        b64 = base64.b64encode(image_bytes).decode("utf-8")
-        data_url = f"data:{mime_type};base64,{b64}"
-
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}",
-        }
+        # single ascii decode of the fully-built bytes payload; the f-string
+        # route copied the multi-MB base64 string a second time
+        data_url = (
+            b"data:" + mime_type.encode("ascii") + b";base64," + base64.b64encode(image_bytes)
+        ).decode("ascii")
 
         payload = {
             "model": self.model_id,
@@ -70,7 +102,7 @@ class MistralV2Adapter(OCRAdapter):
         }
 
         try:
-            resp = self._session.post(self.endpoint, headers=headers, json=payload, timeout=120)
+            resp = self._session.post(self.endpoint, data=_dumps(payload), timeout=120)
         except Exception as e:
             raise RuntimeError(f"MistralV2 request failed: {e}") from e
 
@@ -79,7 +111,7 @@ class MistralV2Adapter(OCRAdapter):
         if resp.status_code >= 400:
             raise RuntimeError(f"MistralV2 HTTP {resp.status_code}: {resp.text[:500]}")
 
-        data = resp.json() if resp.content else {}
+        data = _loads(resp.content) if resp.content else {}
 
         pages = data.get("pages", []) or []
         raw_md_pages = []
@@ -1,31 +1,64 @@
+import os
 import time
 import io
+import threading
 from typing import Any, Dict, List, Optional, Tuple
 
+import cv2
 import numpy as np
 from PIL import Image
 
 from app.adapters.base import OCRAdapter
+from ._raster import pdf_pages_to_rgb
+from ._result_cache import cached
 from .postprocess_markdown import normalize_to_markdown
 
 
 Token = Tuple[str, float, float, float, float]  # (text, x1, y1, x2, y2)
 
+# Model singletons at module scope: main.py caches adapter instances, but a
+# fresh adapter (scripts, tests) should not pay the 1-3 s / 200+ MB Paddle
+# init again. Keyed by config so future lang variants don't collide; the
+# lock stops concurrent first-requests from double-loading.
+_OCR_SINGLETONS: Dict[Tuple[str, bool], Any] = {}
+_OCR_LOCK = threading.Lock()
+# PaddleOCR predictors are not thread-safe; with run_async offloading to
+# worker threads, concurrent requests must take turns on the shared model.
+_INFER_LOCK = threading.Lock()
+
 
 class PaddleOCRAdapter(OCRAdapter):
     def __init__(self):
-        self._ocr = None
+        self.lang = "en"
+        self.use_angle_cls = True
 
     @property
     def name(self) -> str:
         return "paddleocr"
 
     def _get_ocr(self):
-        if self._ocr is None:
-            from paddleocr import PaddleOCR
-            self._ocr = PaddleOCR(use_angle_cls=True, lang="en", show_log=False)
-        return self._ocr
-
+        key = (self.lang, self.use_angle_cls)
+        ocr = _OCR_SINGLETONS.get(key)
+        if ocr is None:
+            with _OCR_LOCK:
+                ocr = _OCR_SINGLETONS.get(key)
+                if ocr is None:
+                    from paddleocr import PaddleOCR
+                    ocr = PaddleOCR(use_angle_cls=self.use_angle_cls, lang=self.lang, show_log=False)
+                    _OCR_SINGLETONS[key] = ocr
+        return ocr
+
+    @staticmethod
+    def _pdf_pages_to_bgr(pdf_bytes: bytes, zoom: float = 200 / 72.0) -> List["np.ndarray"]:
+        """
+        Render every PDF page via the shared rasterizer (one MuPDF pass per
+        PDF across all local adapters, no PNG round-trip), then one cvtColor
+        per page for the contiguous BGR copy Paddle expects. The cvtColor
+        also keeps the shared cached RGB arrays unmutated.
+        """
+        return [cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR) for rgb in pdf_pages_to_rgb(pdf_bytes, zoom=zoom)]
+
+    @cached("paddleocr")
     def run(
         self,
         image_bytes: Optional[bytes] = None,
@@ -33,27 +66,41 @@ class PaddleOCRAdapter(OCRAdapter):
         mime_type: str = "",
         **kwargs
     ) -> Dict[str, Any]:
-        if image_bytes is None:
-            for k in ("file_bytes", "bytes", "image", "content", "data"):
-                if k in kwargs and kwargs[k] is not None:
-                    image_bytes = kwargs[k]
-                    break
         if image_bytes is None:
             raise RuntimeError("PaddleOCRAdapter.run() did not receive image bytes")
 
         mt = (mime_type or "").strip().lower()
 
-        # IMPORTANT:
-        # main.py already converts PDF -> PNG for IMG_ONLY_MODELS.
-        # So adapters should NOT do PDF conversion again.
-
         t0 = time.time()
 
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        arr = np.array(img)[:, :, ::-1]  # RGB->BGR
+        if mt == "application/pdf":
+            # PDF-native path (see PDF_NATIVE_LOCAL in main.py): render every
+            # page straight to a BGR ndarray — one shared rasterize pass and
+            # no intermediate PNG encode/decode.
+            imgs = self._pdf_pages_to_bgr(image_bytes)
+        else:
+            # cv2.imdecode yields contiguous BGR (what Paddle expects) in one
+            # SIMD decode, vs PIL decode + np.array copy + negative-stride view
+            arr = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if arr is None:
+                # exotic formats (WebP/HEIF): fall back to PIL, then one SIMD
+                # RGB->BGR pass (a [:, :, ::-1] view would make Paddle copy
+                # the negative-stride array again internally)
+                img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+                arr = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
+            imgs = [arr]
 
         ocr = self._get_ocr()
-        result = ocr.ocr(arr, cls=True)
+        # paddleocr 2.7.x rejects list input while det=True: it logs an error
+        # and calls exit(0), which escapes as SystemExit past the server's
+        # except Exception. Feed pages one ndarray at a time; each call
+        # returns that page's lines wrapped in a one-element list, so
+        # extending keeps result aligned with imgs for the y-offset below.
+        with _INFER_LOCK:
+            result: List[Any] = []
+            for img in imgs:
+                r = ocr.ocr(img, cls=True)
+                result.extend(r if isinstance(r, list) else [r])
 
         lines_objs: List[Dict[str, Any]] = []
         lines_text: List[str] = []
@@ -61,30 +108,63 @@ class PaddleOCRAdapter(OCRAdapter):
         boxes_out: List[List[List[int]]] = []
         tokens: List[Token] = []
 
-        if result and isinstance(result, list):
-            page0 = result[0] if len(result) > 0 else []
-            if page0 and isinstance(page0, list):
-                for item in page0:
-                    if not item or len(item) < 2:
-                        continue
-
-                    box = item[0]
-                    txt_conf = item[1]
-
-                    if not isinstance(txt_conf, (list, tuple)) or len(txt_conf) < 2:
+        pages = result if (result and isinstance(result, list)) else []
+        # tokens feed normalize_to_markdown's row clustering; shifting each
+        # page's ys by the heights above it keeps pages from interleaving
+        y_off = 0.0
+        for page_idx, page in enumerate(pages):
+            if page and isinstance(page, list):
+                # Batch the whole page's quads into one (N, 4, 2) array and
+                # take the AABBs with four vectorized reductions; thousands
+                # of detections cost 4 ufunc calls instead of N small ones.
+                # Ragged pages (malformed boxes) fall back to per-item work.
+                page_pts: Optional[List[List[List[int]]]] = None
+                page_aabb = None
+                try:
+                    arr_all = np.asarray([it[0] for it in page], dtype=np.int32)
+                    if arr_all.ndim == 3 and arr_all.shape[1:] == (4, 2):
+                        page_pts = arr_all.tolist()
+                        xs, ys = arr_all[:, :, 0], arr_all[:, :, 1]
+                        page_aabb = np.stack(
+                            [xs.min(1), ys.min(1), xs.max(1), ys.max(1)], axis=1
+                        ).astype(np.float64).tolist()
+                except Exception:
+                    page_pts = None
+
+                for item_idx, item in enumerate(page):
+                    # EAFP: well-formed Paddle output is the overwhelming
+                    # common case, so one try (free unless it raises) beats
+                    # several isinstance/len guards per detection
+                    try:
+                        box = item[0]
+                        text = str(item[1][0]).strip()
+                        raw_conf = item[1][1]
+                    except (TypeError, IndexError, KeyError):
                         continue
 
-                    text = str(txt_conf[0]).strip()
                     try:
-                        conf = float(txt_conf[1])
-                    except Exception:
+                        conf = float(raw_conf)
+                    except (TypeError, ValueError):
                         conf = 0.0
 
                     pts: List[List[int]] = []
-                    if isinstance(box, list):
-                        for pt in box:
-                            if isinstance(pt, (list, tuple)) and len(pt) == 2:
-                                pts.append([int(pt[0]), int(pt[1])])
+                    aabb: Optional[Tuple[float, float, float, float]] = None
+                    if page_pts is not None:
+                        pts = page_pts[item_idx]
+                        x1, y1, x2, y2 = page_aabb[item_idx]
+                        aabb = (x1, y1, x2, y2)
+                    elif box is not None:
+                        # one C-level pass over the quad instead of a per-point
+                        # Python loop + min/max comprehensions
+                        try:
+                            arr_box = np.asarray(box, dtype=np.int32)
+                            if arr_box.ndim == 2 and arr_box.shape[1] == 2:
+                                pts = arr_box.tolist()
+                                x1, y1 = arr_box.min(axis=0).tolist()
+                                x2, y2 = arr_box.max(axis=0).tolist()
+                                aabb = (float(x1), float(y1), float(x2), float(y2))
+                        except Exception:
+                            pts = []
 
                     if not text:
                         continue
@@ -94,14 +174,8 @@ class PaddleOCRAdapter(OCRAdapter):
 
                     if pts:
                         boxes_out.append(pts)
-                        try:
-                            xs = [p[0] for p in pts]
-                            ys = [p[1] for p in pts]
-                            x1, x2 = float(min(xs)), float(max(xs))
-                            y1, y2 = float(min(ys)), float(max(ys))
-                            tokens.append((text, x1, y1, x2, y2))
-                        except Exception:
-                            pass
+                        if aabb is not None:
+                            tokens.append((text, aabb[0], aabb[1] + y_off, aabb[2], aabb[3] + y_off))
 
                     lines_objs.append(
                         {
@@ -111,6 +185,9 @@ class PaddleOCRAdapter(OCRAdapter):
                         }
                     )
 
+            if page_idx < len(imgs):
+                y_off += float(imgs[page_idx].shape[0])
+
         extracted_plain = "\n".join(lines_text).strip()
         extracted_text = normalize_to_markdown(extracted_plain, tokens=tokens)
 
@@ -128,12 +205,14 @@ class PaddleOCRAdapter(OCRAdapter):
             "line_count": len(lines_objs),
             "chars": len(extracted_text),
             "avg_conf": avg_conf,
-            "raw": {
-                "lines_text": lines_text,
-                "boxes": boxes_out,
-                "confs": confs,
-                # NOTE: paddle_raw removed because it can be HUGE and slows JSON
-                # If you want it back, add env flag later.
-            },
+            # NOTE: paddle_raw removed because it can be HUGE and slows JSON.
+            # boxes/confs are only for debugging too — on dense multi-page
+            # docs they dominate the response, so they ride the same
+            # OCR_KEEP_RAW=1 flag the other adapters use.
+            "raw": (
+                {"lines_text": lines_text, "boxes": boxes_out, "confs": confs}
+                if os.getenv("OCR_KEEP_RAW", "0").strip() == "1"
+                else {"engine": "paddleocr", "pages": len(imgs)}
+            ),
         }
 
@@ -1,59 +1,202 @@
 import re
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Tuple, Dict, Any
 
+import numpy as np
+
 # token = (text, x1, y1, x2, y2)
 Token = Tuple[str, float, float, float, float]
 
 
-def html_to_markdown(text: str) -> str:
-    if not text:
-        return ""
+@dataclass
+class TokensSoA:
+    """
+    Structure-of-arrays token layout: one ndarray per coordinate column plus
+    a parallel list of texts. Row clustering and left-right ordering become
+    vectorized sorts/splits instead of Python sorts over dicts/tuples.
+    """
 
-    # <b>Ship To:</b> -> **Ship To:**
-    text = re.sub(r"<\s*b\s*>", "**", text, flags=re.IGNORECASE)
-    text = re.sub(r"<\s*/\s*b\s*>", "**", text, flags=re.IGNORECASE)
+    x1: np.ndarray
+    y1: np.ndarray
+    x2: np.ndarray
+    y2: np.ndarray
+    score: np.ndarray
+    text: List[str]
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def to_rows(self, y_tol: float = 10.0) -> List[List[Token]]:
+        """Cluster into top-to-bottom rows, each sorted left-to-right."""
+        if not self.text:
+            return []
+
+        yc = (self.y1 + self.y2) * 0.5
+        order = np.argsort(yc, kind="stable")
+        # new row wherever the vertical gap between consecutive centers > tol
+        breaks = np.flatnonzero(np.diff(yc[order]) > y_tol) + 1
+
+        rows: List[List[Token]] = []
+        for g in np.split(order, breaks):
+            g = g[np.argsort(self.x1[g], kind="stable")]
+            rows.append(
+                [
+                    (self.text[i], float(self.x1[i]), float(self.y1[i]), float(self.x2[i]), float(self.y2[i]))
+                    for i in g
+                ]
+            )
+        return rows
+
+
+# Matches a fenced block (optionally tagged ```markdown / ```json etc.)
+# and captures the inner content, so the fence strip is one regex pass
+# instead of split + max + splitlines + replace.
+_FENCE_RE = re.compile(r"```(?:[A-Za-z]{1,12}[ \t]*\n)?(.*?)```", re.S)
+
+_BAD_PREFACES = frozenset(
+    {
+        "here is the extracted text",
+        "extracted text",
+        "ocr output",
+        "output",
+        "result",
+    }
+)
+
+# Stray language tags the model sometimes leaves on their own line
+_JUNK_LINES = frozenset({"markdown", "json", "text"})
+
+
+def _clean_lines(s: str) -> List[str]:
+    """Fence/preface/junk cleanup, returning kept lines (empties preserved)."""
+    s = (s or "").strip()
+    if not s:
+        return []
 
-    # remove other simple tags (keep content)
-    text = re.sub(r"</?[^>]+>", "", text)
+    # remove code fences but keep inner content (largest fenced block wins)
+    if "```" in s:
+        blocks = _FENCE_RE.findall(s)
+        if blocks:
+            s = max(blocks, key=len).strip()
+        if "```" in s:
+            s = s.replace("```", "").strip()
+
+    cleaned: List[str] = []
+    preface_done = False
+    for ln in s.splitlines():
+        t = ln.strip()
+        if not t:
+            cleaned.append("")
+            continue
+        low = t.lower().rstrip(":")
+        if not preface_done and low in _BAD_PREFACES:
+            continue
+        preface_done = True
+        if low in _JUNK_LINES and len(t) <= 12:
+            continue
+        cleaned.append(ln.rstrip())
 
-    return text
+    return cleaned
 
 
-def _cluster_rows(tokens: List[Token], y_tol: float = 10.0) -> List[List[Token]]:
+# str in, str out and pure -> safe to memoize. Retries and duplicate uploads
+# re-run postprocessing on identical responses; the LRU makes those free.
+# Documents above _MEMO_MAX_CHARS bypass the memo: lru_cache retains both
+# key and value for the life of the process, so without a size cutoff 512
+# full-document texts could pin tens of MB for a cache that only ever helps
+# exact duplicates. Worst-case retention is now maxsize * 2 * the cutoff.
+_MEMO_MAX_CHARS = 16 * 1024
+
+
+@lru_cache(maxsize=512)
+def _clean_ocr_text_memo(s: str) -> str:
+    return "\n".join(_clean_lines(s)).strip()
+
+
+def clean_ocr_text(s: str) -> str:
     """
-    Group tokens into rows by their y-center.
-    y_tol is in pixels; adjust if needed depending on your OCR resolution.
+    Strip code fences, leading prefaces and stray language-tag lines from an
+    LLM OCR response. Shared by the API adapters; one compiled regex plus a
+    single line loop instead of each adapter's 4-6 string passes.
     """
-    items = []
-    for t, x1, y1, x2, y2 in tokens:
-        yc = (y1 + y2) / 2.0
-        items.append((yc, t, x1, y1, x2, y2))
+    if len(s) > _MEMO_MAX_CHARS:
+        return "\n".join(_clean_lines(s)).strip()
+    return _clean_ocr_text_memo(s)
 
-    items.sort(key=lambda z: z[0])
 
-    rows: List[List[Token]] = []
-    cur: List[Token] = []
-    cur_y = None
+def clean_and_linify(s: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Fused clean_ocr_text + html->markdown + line splitting. The cleanup loop
+    runs once and the line dicts are built from the same kept-line list, so
+    the response isn't re-split and re-joined by each postprocess stage.
+    Returns (text, lines) shaped like the adapters' existing result fields.
+    """
+    kept = _clean_lines(s)
+    text = "\n".join(kept).strip()
 
-    for yc, t, x1, y1, x2, y2 in items:
-        if cur_y is None:
-            cur_y = yc
-            cur = [(t, x1, y1, x2, y2)]
-            continue
+    if "<" in text:
+        # tag substitution can change line content -> rebuild lines after it
+        text = html_to_markdown(text)
+        kept = text.split("\n")
 
-        if abs(yc - cur_y) <= y_tol:
-            cur.append((t, x1, y1, x2, y2))
-        else:
-            rows.append(cur)
-            cur = [(t, x1, y1, x2, y2)]
-            cur_y = yc
+    lines = [
+        {"text": ln, "score": None, "box": None}
+        for ln in map(str.rstrip, kept)
+        if ln.strip()
+    ]
+    return text, lines
+
+
+# One fused pattern: group 1 catches <b>/</b> (bold -> **), the alternative
+# catches any other simple tag (dropped, content kept). One scan over the
+# text instead of three sequential re.sub passes.
+_TAG_RE = re.compile(r"(<\s*/?\s*b\s*>)|</?[^>]+>", re.IGNORECASE)
+
+
+def _tag_sub(m: "re.Match") -> str:
+    return "**" if m.group(1) else ""
 
-    if cur:
-        rows.append(cur)
 
-    # sort tokens left->right in each row
-    for r in rows:
-        r.sort(key=lambda z: z[1])  # x1
+@lru_cache(maxsize=512)
+def _html_to_markdown_memo(text: str) -> str:
+    return _TAG_RE.sub(_tag_sub, text)
+
+
+def html_to_markdown(text: str) -> str:
+    if not text:
+        return ""
+    # <b>Ship To:</b> -> **Ship To:**; other tags removed
+    # (big documents bypass the memo — see _MEMO_MAX_CHARS)
+    if len(text) > _MEMO_MAX_CHARS:
+        return _TAG_RE.sub(_tag_sub, text)
+    return _html_to_markdown_memo(text)
+
+
+def _cluster_rows(tokens: List[Token], y_tol: float = 10.0) -> List[List[Token]]:
+    """
+    Group tokens into rows by their y-center.
+    y_tol is in pixels; adjust if needed depending on your OCR resolution.
+    """
+    if not tokens:
+        return []
+
+    # Same sort + gap-split scheme as TokensSoA.to_rows: argsort the
+    # y-centers once, cut wherever the gap between consecutive centers
+    # exceeds the tolerance, and np.split the index array into row groups.
+    # The clustering itself never touches Python-level tuples.
+    yc = np.fromiter(
+        ((t[2] + t[4]) * 0.5 for t in tokens), dtype=np.float64, count=len(tokens)
+    )
+    order = np.argsort(yc, kind="stable")
+    breaks = np.flatnonzero(np.diff(yc[order]) > y_tol) + 1
+
+    x1 = np.fromiter((t[1] for t in tokens), dtype=np.float64, count=len(tokens))
+
+    rows: List[List[Token]] = []
+    for g in np.split(order, breaks):
+        g = g[np.argsort(x1[g], kind="stable")]  # left->right within the row
+        rows.append([tokens[i] for i in g])
 
     return rows
 
@@ -62,24 +205,22 @@ def _infer_columns(rows: List[List[Token]], max_cols: int = 8) -> List[float]:
     """
     Infer column x-centers using a simple clustering of token x-centers.
     """
-    xs = []
-    for r in rows:
-        for _, x1, _, x2, _ in r:
-            xs.append((x1 + x2) / 2.0)
-
-    if not xs:
+    xs = np.fromiter(
+        ((x1 + x2) * 0.5 for r in rows for _, x1, _, x2, _ in r), dtype=np.float64
+    )
+    if xs.size == 0:
         return []
 
+    # sort + gap-split (same scheme as row clustering): cut wherever two
+    # consecutive sorted centers are further apart than the column
+    # separation threshold, then take each group's true mean. Unlike the
+    # old greedy running-average, the center can't drift toward whichever
+    # tokens happened to merge first, so columns stay stable.
     xs.sort()
-    cols = [xs[0]]
-    for x in xs[1:]:
-        if abs(x - cols[-1]) > 35:  # column separation threshold in px
-            cols.append(x)
-        else:
-            cols[-1] = (cols[-1] + x) / 2.0
+    cuts = np.flatnonzero(np.diff(xs) > 35.0) + 1  # threshold in px
 
     # keep only first N columns
-    return cols[:max_cols]
+    return [float(g.mean()) for g in np.split(xs, cuts)[:max_cols]]
 
 
 def _assign_to_columns(row: List[Token], col_centers: List[float]) -> List[str]:
@@ -87,10 +228,17 @@ def _assign_to_columns(row: List[Token], col_centers: List[float]) -> List[str]:
         # fallback: just join tokens
         return [" ".join([t[0] for t in row]).strip()]
 
+    # _infer_columns returns sorted centers, so nearest-center assignment is
+    # a searchsorted against the midpoints — one vectorized O(n log k) pass
+    # instead of a Python min() scan over every column per token.
+    centers = np.asarray(col_centers, dtype=np.float64)
+    xc = np.fromiter(
+        ((t[1] + t[3]) * 0.5 for t in row), dtype=np.float64, count=len(row)
+    )
+    idx = np.searchsorted((centers[:-1] + centers[1:]) * 0.5, xc)
+
     cells = [""] * len(col_centers)
-    for text, x1, y1, x2, y2 in row:
-        xc = (x1 + x2) / 2.0
-        j = min(range(len(col_centers)), key=lambda k: abs(col_centers[k] - xc))
+    for (text, *_), j in zip(row, idx.tolist()):
         if cells[j]:
             cells[j] += " " + text
         else:
@@ -99,12 +247,27 @@ def _assign_to_columns(row: List[Token], col_centers: List[float]) -> List[str]:
     return [c.strip() for c in cells]
 
 
-def tokens_to_markdown_table(tokens: List[Token]) -> str:
+# cell escaping runs once per table cell; one precompiled-regex pass beats
+# the chained replace("\n")/replace("|") pair that allocated twice per cell
+_MD_ESC_RE = re.compile(r"[|\n]")
+_MD_ESC_MAP = {"|": "\\|", "\n": " "}
+
+
+def _md_escape(s: str) -> str:
+    if not s:
+        return ""
+    return _MD_ESC_RE.sub(lambda m: _MD_ESC_MAP[m.group(0)], s.strip())
+
+
+def tokens_to_markdown_table(tokens) -> str:
     """
-    Converts bbox tokens into a markdown table.
+    Converts bbox tokens (list of tuples or TokensSoA) into a markdown table.
     This is heuristic-based (good for invoices/receipts).
     """
-    rows = _cluster_rows(tokens, y_tol=10.0)
+    if isinstance(tokens, TokensSoA):
+        rows = tokens.to_rows(y_tol=10.0)
+    else:
+        rows = _cluster_rows(tokens, y_tol=10.0)
     if len(rows) < 2:
         return ""
 
@@ -132,24 +295,19 @@ def tokens_to_markdown_table(tokens: List[Token]) -> str:
         header = [f"Col {i+1}" for i in range(len(header))]
         body = grid
 
-    def md_escape(s: str) -> str:
-        return (s or "").replace("\n", " ").replace("|", "\\|").strip()
-
-    md = []
-    md.append("| " + " | ".join(md_escape(h) for h in header) + " |")
-    md.append("| " + " | ".join("---" for _ in header) + " |")
-    for r in body:
-        md.append("| " + " | ".join(md_escape(c) for c in r) + " |")
+    md = ["| " + " | ".join(_md_escape(h) for h in header) + " |"]
+    md.append("| " + " | ".join(("---",) * len(header)) + " |")
+    md.extend("| " + " | ".join(_md_escape(c) for c in r) + " |" for r in body)
 
     return "\n".join(md)
 
 
-def normalize_to_markdown(text: str, tokens: List[Token] = None) -> str:
+def normalize_to_markdown(text: str, tokens=None) -> str:
     """
-    1) Try bbox->table if tokens provided
+    1) Try bbox->table if tokens provided (list of tuples or TokensSoA)
     2) Else do html->markdown cleanup
     """
-    if tokens:
+    if tokens is not None and len(tokens):
         table_md = tokens_to_markdown_table(tokens)
         if table_md:
             # Keep original text on top (cleaned) + table below
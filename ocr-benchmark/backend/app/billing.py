@@ -1,7 +1,7 @@
 # ocr-benchmark/backend/app/billing.py
 
 from __future__ import annotations
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 import os
 
 CPU_PER_HOUR_USD = float(os.getenv("CPU_PER_HOUR_USD", "0.05"))
@@ -32,35 +32,44 @@ def _env_price(name: str, default: float = 0.0) -> float:
     except Exception:
         return default
 
-TOKEN_PRICING_USD_PER_TOKEN: Dict[str, Dict[str, float]] = {
+# (in_rate, out_rate) per token, resolved once at import — runs on every
+# benchmark row, so no per-call dict.get + float() re-coercion.
+TOKEN_PRICING_USD_PER_TOKEN: Dict[str, Tuple[float, float]] = {
     # Existing placeholders you had:
-    "mistral": {"in": _env_price("MISTRAL_USD_PER_INPUT_TOKEN", 0.0), "out": _env_price("MISTRAL_USD_PER_OUTPUT_TOKEN", 0.0)},
-    "glm-ocr": {"in": _env_price("GLM_USD_PER_INPUT_TOKEN", 0.0), "out": _env_price("GLM_USD_PER_OUTPUT_TOKEN", 0.0)},
-    "gemini3": {"in": _env_price("GEMINI3_USD_PER_INPUT_TOKEN", 0.0), "out": _env_price("GEMINI3_USD_PER_OUTPUT_TOKEN", 0.0)},
-    "gemini3pro": {"in": _env_price("GEMINI3PRO_USD_PER_INPUT_TOKEN", 0.0), "out": _env_price("GEMINI3PRO_USD_PER_OUTPUT_TOKEN", 0.0)},
+    "mistral": (_env_price("MISTRAL_USD_PER_INPUT_TOKEN", 0.0), _env_price("MISTRAL_USD_PER_OUTPUT_TOKEN", 0.0)),
+    "glm-ocr": (_env_price("GLM_USD_PER_INPUT_TOKEN", 0.0), _env_price("GLM_USD_PER_OUTPUT_TOKEN", 0.0)),
+    "gemini3": (_env_price("GEMINI3_USD_PER_INPUT_TOKEN", 0.0), _env_price("GEMINI3_USD_PER_OUTPUT_TOKEN", 0.0)),
+    "gemini3pro": (_env_price("GEMINI3PRO_USD_PER_INPUT_TOKEN", 0.0), _env_price("GEMINI3PRO_USD_PER_OUTPUT_TOKEN", 0.0)),
 
     # ✅ GPT-5.2 (Azure/OpenAI) – set these env vars if you know rates:
     # GPT52_USD_PER_INPUT_TOKEN and GPT52_USD_PER_OUTPUT_TOKEN
-    "gpt-5.2": {"in": _env_price("GPT52_USD_PER_INPUT_TOKEN", 0.0), "out": _env_price("GPT52_USD_PER_OUTPUT_TOKEN", 0.0)},
+    "gpt-5.2": (_env_price("GPT52_USD_PER_INPUT_TOKEN", 0.0), _env_price("GPT52_USD_PER_OUTPUT_TOKEN", 0.0)),
 }
 
+# Pricing comes from env at import, so which models can ever bill by tokens
+# is static: build_billing checks this set instead of re-deriving "both
+# rates are zero" from the table on every row.
+_TOKEN_PRICED_MODELS = frozenset(
+    name for name, rates in TOKEN_PRICING_USD_PER_TOKEN.items() if rates != (0.0, 0.0)
+)
+
+
 def compute_cost_from_tokens(
     model: str,
     input_tokens: Optional[float],
     output_tokens: Optional[float],
 ) -> Optional[float]:
     pricing = TOKEN_PRICING_USD_PER_TOKEN.get(model)
-    if not pricing:
+    # (0.0, 0.0) means "unknown pricing" -> fall back to time-based estimate
+    if not pricing or pricing == (0.0, 0.0):
         return None
 
-    it = _to_float(input_tokens) or 0.0
-    ot = _to_float(output_tokens) or 0.0
-
-    # if both prices are zero, treat as "unknown pricing"
-    if float(pricing.get("in", 0.0)) == 0.0 and float(pricing.get("out", 0.0)) == 0.0:
+    # one try/except covers both coercions instead of two _to_float calls
+    try:
+        cost = float(input_tokens or 0.0) * pricing[0] + float(output_tokens or 0.0) * pricing[1]
+    except Exception:
         return None
-
-    return it * float(pricing.get("in", 0.0)) + ot * float(pricing.get("out", 0.0))
+    return None if cost != cost else cost  # NaN tokens -> unknown
 
 def build_billing(
     model: Optional[str] = None,
@@ -101,18 +110,21 @@ def build_billing(
         or usage.get("completion_tokens")
     )
 
-    # Token-based (only if pricing exists for that model)
-    token_cost = compute_cost_from_tokens(model, input_tokens, output_tokens)
-    if token_cost is not None:
-        return {
-            "type": "api_actual_tokens",
-            "basis": "tokens",
-            "currency": "USD",
-            "model": model,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "cost_usd": round(token_cost, 6),
-        }
+    # Token-based only for models that can actually price tokens; everyone
+    # else (local models, unknown pricing) goes straight to the time branch
+    # without touching the pricing table.
+    if model in _TOKEN_PRICED_MODELS:
+        token_cost = compute_cost_from_tokens(model, input_tokens, output_tokens)
+        if token_cost is not None:
+            return {
+                "type": "api_actual_tokens",
+                "basis": "tokens",
+                "currency": "USD",
+                "model": model,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cost_usd": round(token_cost, 6),
+            }
 
     # Fallback: time-based estimate (works for local + api)
     est = estimate_cost_time_usd(latency_ms, CPU_PER_HOUR_USD)